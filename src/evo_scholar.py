@@ -7,19 +7,193 @@ It fetches recent arXiv paper summaries, generates a new research paper blending
 from different STEM fields, and iteratively refines the paper based on evaluation feedback.
 """
 
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
 import os
 import re
 import subprocess
 import sys
+import tempfile
+import time
+import types
 import unittest
-import arxiv
+from unittest import mock
+
+import aiofiles
+import aiohttp
+import feedparser
 
 # Import OpenAI library (adjust as needed for your environment)
-from openai import OpenAI  # Make sure you have the openai package installed
+from openai import AsyncOpenAI  # Make sure you have the openai package installed
+
+# Sections every generated paper must contain.
+REQUIRED_SECTIONS = (
+    "Title:",
+    "Abstract:",
+    "Introduction:",
+    "Proposed Method:",
+    "Conclusion:",
+)
+
+# Patterns are compiled once here rather than on every extract call.
+_CODE_BLOCK_RE = re.compile(r"```(?:python)?\n(.*?)\n```", re.DOTALL)
+_TRAILING_FENCE_RE = re.compile(r"\n?```[ \t]*\Z")
+# Version markers, tolerating spacing variations such as "=== PAPER 1 ===".
+_PAPER_MARKER = r"^=+[ \t]*PAPER[ \t]*\d+[ \t]*=+[ \t]*$"
+_PAPER_MARKER_RE = re.compile(_PAPER_MARKER, re.MULTILINE | re.IGNORECASE)
+# A version runs until the next marker line, so "===" inside a paper (e.g. a Markdown rule) is kept.
+_PAPER_VERSION_RE = re.compile(
+    _PAPER_MARKER + r"\n?(.*?)(?=" + _PAPER_MARKER + r"|\Z)",
+    re.DOTALL | re.MULTILINE | re.IGNORECASE,
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+ARXIV_TIMEOUT_SECONDS = 10
+
+# Suggested location for persisting the prompt -> paper cache between runs (opt-in).
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "evoscholar.json")
+# Number of prompts kept in the cache; the least recently used ones are evicted first.
+MAX_CACHE_ENTRIES = 256
+# Seconds between status checks of a submitted batch.
+BATCH_POLL_SECONDS = 30
+# Batch statuses after which the batch will not progress any further.
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Streaming stops once a paper grows past this multiple of its word limit.
+STREAM_CUTOFF_RATIO = 1.2
+
+
+def parse_arxiv_feed(content):
+    """
+    Parses an arXiv Atom API response into paper summaries.
+    Titles and abstracts are collapsed onto a single line, since the feed wraps them.
+
+    Args:
+        content (bytes): The raw Atom XML.
+
+    Returns:
+        list: A list of dictionaries with keys: title, abstract, link.
+    """
+    feed = feedparser.parse(content)
+    return [
+        {
+            "title": _WHITESPACE_RE.sub(" ", entry.title).strip(),
+            "abstract": _WHITESPACE_RE.sub(" ", entry.summary).strip(),
+            "link": entry.id,
+        }
+        for entry in feed.entries
+    ]
+
+
+def count_new_words(delta, in_word):
+    """
+    Counts the words a streamed text fragment adds to the text received so far.
+
+    Args:
+        delta (str): The new fragment.
+        in_word (bool): Whether the text so far ends in the middle of a word.
+
+    Returns:
+        tuple: (number of new words, whether the text now ends mid-word).
+    """
+    if not delta:
+        return 0, in_word
+    new_words = len(delta.split())
+    if in_word and not delta[0].isspace():
+        # The fragment continues the previous word.
+        new_words -= 1
+    return new_words, not delta[-1].isspace()
+
+
+class RateLimiter:
+    """
+    Keeps API usage under per-minute request and token quotas.
+
+    Both quotas are token buckets that refill continuously; a request waits until
+    enough capacity is available in both. The number of in-flight requests is capped as well.
+    """
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=100_000, max_concurrency=8):
+        """
+        Args:
+            requests_per_minute (int): Maximum number of requests per minute.
+            tokens_per_minute (int): Maximum number of (estimated) tokens per minute.
+            max_concurrency (int): Maximum number of requests in flight at once.
+        """
+        if requests_per_minute <= 0 or tokens_per_minute <= 0 or max_concurrency <= 0:
+            raise ValueError(
+                "requests_per_minute, tokens_per_minute and max_concurrency must be positive."
+            )
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + elapsed * self.requests_per_minute / 60,
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute,
+            self._available_tokens + elapsed * self.tokens_per_minute / 60,
+        )
+
+    async def _wait_for_capacity(self, tokens):
+        # A request larger than the whole bucket would otherwise wait forever.
+        tokens = min(tokens, self.tokens_per_minute)
+        # Waiters queue on the lock, so capacity is handed out in arrival order.
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+                await asyncio.sleep(max(
+                    (1 - self._available_requests) * 60 / self.requests_per_minute,
+                    (tokens - self._available_tokens) * 60 / self.tokens_per_minute,
+                ))
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, estimated_tokens=0):
+        """
+        Waits for a concurrency slot and rate-limit capacity, then holds the slot
+        for the duration of the `async with` block.
+
+        Args:
+            estimated_tokens (int): Estimated prompt plus completion tokens of the request.
+        """
+        async with self._semaphore:
+            await self._wait_for_capacity(estimated_tokens)
+            yield
 
 
 class SelfImprovingResearchAgent:
-    def __init__(self, model="grok-2-latest", iterations=1, test_mode=False):
+    def __init__(
+        self,
+        model="grok-2-latest",
+        iterations=1,
+        test_mode=False,
+        num_candidates=4,
+        max_concurrency=8,
+        requests_per_minute=60,
+        tokens_per_minute=100_000,
+        refinements_per_call=None,
+        cache_path=None,
+        max_cache_entries=MAX_CACHE_ENTRIES,
+        batch_mode=False,
+        max_no_improvement=2,
+    ):
         """
         Initialize the research agent.
 
@@ -27,52 +201,277 @@ class SelfImprovingResearchAgent:
             model (str): The model name to use for text generation.
             iterations (int): Number of refinement iterations.
             test_mode (bool): If True, bypass external API calls and use dummy responses.
+            num_candidates (int): Number of initial papers sampled from a single request;
+                the best one is kept for refinement.
+            max_concurrency (int): Maximum number of in-flight API requests.
+            requests_per_minute (int): API request quota per minute.
+            tokens_per_minute (int): API token quota per minute.
+            refinements_per_call (int): Number of refined versions requested in a single
+                API call. Defaults to `iterations`, i.e. one call for the whole loop.
+            cache_path (str): JSON file the prompt cache is persisted to between runs, e.g.
+                DEFAULT_CACHE_PATH. None (the default) keeps it in memory for this agent only.
+                Ignored in test mode.
+            max_cache_entries (int): Maximum number of prompts kept in the cache.
+            batch_mode (bool): If True, candidate papers are generated through the Batch API,
+                which is cheaper and not subject to per-minute limits but may take hours.
+            max_no_improvement (int): Stop refining after this many consecutive refinements
+                that leave the evaluation feedback unchanged. The feedback is checked between
+                refinement calls, so with the default `refinements_per_call` (all iterations in
+                one call) this never triggers; set `refinements_per_call` below `iterations` to use it.
         """
         self.model = model
         self.iterations = iterations
         self.test_mode = test_mode
+        self.num_candidates = num_candidates
+        self.refinements_per_call = refinements_per_call or max(iterations, 1)
+        self._limiter = RateLimiter(requests_per_minute, tokens_per_minute, max_concurrency)
+        self.cache_path = None if test_mode else cache_path
+        self.max_cache_entries = max_cache_entries
+        self.batch_mode = batch_mode
+        self.max_no_improvement = max_no_improvement
+        self._cache: dict[str, str | list] = self._load_cache()
         if not self.test_mode:
-            self.client = OpenAI(
+            self.client = AsyncOpenAI(
                 api_key=os.getenv("XAI_API_KEY"),
                 base_url="https://api.x.ai/v1",
             )
         else:
             self.client = None  # Dummy client for testing
 
+    def _cache_key(self, prompt, n=1):
+        """
+        Returns the exact-match cache key for a prompt sampled `n` times.
+        """
+        return hashlib.blake2b(f"{self.model}\n{n}\n{prompt}".encode(), digest_size=16).hexdigest()
+
+    def _load_cache(self):
+        """
+        Loads the persisted prompt cache, returning an empty one if it is missing or unreadable.
+        """
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Entries are stored oldest first; keep the most recent ones.
+        return dict(list(cache.items())[-self.max_cache_entries:])
+
+    def _save_cache(self):
+        """
+        Persists the prompt cache to `cache_path`.
+        """
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _cache_get(self, key, default=None):
+        """
+        Returns a cached result, marking it as recently used.
+        """
+        if key not in self._cache:
+            return default
+        value = self._cache.pop(key)
+        self._cache[key] = value
+        return value
+
+    def _cache_put(self, key, value):
+        """
+        Caches a result, evicting the least recently used entries beyond `max_cache_entries`.
+        """
+        self._cache.pop(key, None)
+        self._cache[key] = value
+        while len(self._cache) > self.max_cache_entries:
+            del self._cache[next(iter(self._cache))]
+
+    def _messages(self, prompt):
+        """
+        Returns the chat messages sent for a generation prompt.
+        """
+        return [
+            {"role": "system", "content": "You are an AI research paper generator."},
+            {"role": "user", "content": prompt},
+        ]
+
     def extract_text(self, text):
         """
         Extracts text from a Markdown code block if present.
         If no code block is found, returns the stripped text.
+        When the text holds several `===PAPER k===` versions, only the last one is kept.
         """
-        code_block = re.search(r"```(?:python)?\n(.*?)\n```", text, re.DOTALL)
+        versions = _PAPER_VERSION_RE.findall(text)
+        if versions:
+            text = versions[-1].strip()
+            if text.count("```") % 2:
+                # The whole multi-version answer was fenced; drop the closing fence.
+                text = _TRAILING_FENCE_RE.sub("", text)
+        code_block = _CODE_BLOCK_RE.search(text)
         if code_block:
             return code_block.group(1).strip()
         return text.strip()
 
-    def generate_paper(self, prompt):
+    async def generate_paper(
+        self, prompt, max_words=500, n=1, allow_cutoff=False
+    ):
         """
         Generates a research paper (as text) based on the given prompt.
+        With n > 1, n papers are sampled from a single request.
+        The response is streamed; with allow_cutoff, it is closed early once every paper
+        exceeds the word limit by STREAM_CUTOFF_RATIO. A cut-off paper keeps its last complete
+        `===PAPER k===` version, or is returned as an empty string if it has none.
+        Responses are cached per prompt, so repeated prompts skip the API call;
+        responses that were cut off are not cached.
         In test mode, returns a dummy paper.
+
+        Args:
+            prompt (str): The generation prompt.
+            max_words (int): Word limit of each expected paper.
+            n (int): Number of papers to sample.
+            allow_cutoff (bool): Stop streaming once every paper is far over the word limit.
+                Only for callers that can fall back to something when they get an empty paper.
+
+        Returns:
+            str | list: The generated paper, or a list of n papers when n > 1.
         """
+        key = self._cache_key(prompt, n)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
         if self.test_mode:
             # Return a dummy research paper for testing purposes.
-            return (
+            paper = (
                 "Title: Dummy Research Paper\n"
                 "Abstract: This is a dummy abstract for testing purposes.\n"
                 "Introduction: An introduction to the dummy paper.\n"
                 "Proposed Method: A dummy method is proposed.\n"
                 "Conclusion: The paper concludes with dummy insights."
             )
+            return paper if n == 1 else [paper] * n
+
+        parts = [[] for _ in range(n)]
+        word_counts = [0] * n
+        in_word = [False] * n
+        over_limit = set()
+        truncated = False
+        # Rough estimate: ~4 characters per prompt token, ~1.3 tokens per generated word.
+        estimated_tokens = len(prompt) // 4 + int(max_words * 1.3) * n
+        async with self._limiter.acquire(estimated_tokens=estimated_tokens):
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt),
+                n=n,
+                stream=True,
+            )
+            try:
+                async for chunk in response:
+                    for choice in chunk.choices:
+                        i = choice.index
+                        delta = choice.delta.content
+                        if not delta:
+                            continue
+                        parts[i].append(delta)
+                        if not allow_cutoff or i in over_limit:
+                            continue
+                        new_words, in_word[i] = count_new_words(delta, in_word[i])
+                        word_counts[i] += new_words
+                        if word_counts[i] > max_words * STREAM_CUTOFF_RATIO:
+                            over_limit.add(i)
+                    if allow_cutoff and len(over_limit) == n:
+                        truncated = True
+                        break
+            finally:
+                # Closing the stream early stops generation of the remaining tokens.
+                await response.close()
+        texts = ["".join(choice_parts) for choice_parts in parts]
+        if truncated:
+            for i, text in enumerate(texts):
+                # A cut-off response ends in an unfinished version; keep only the
+                # complete versions before it, if there are any.
+                markers = list(_PAPER_MARKER_RE.finditer(text))
+                texts[i] = text[:markers[-1].start()] if len(markers) > 1 else ""
+        papers = [self.extract_text(text) for text in texts]
+        result = papers[0] if n == 1 else papers
+        if truncated:
+            # A cut-off paper is incomplete; caching it would serve it for this prompt forever.
+            return result
+        self._cache_put(key, result)
+        return result
+
+    async def run_batch(self, prompts, n=1):
+        """
+        Generates papers for each prompt through the Batch API.
+        Prompts already in the cache are served from it; the rest are uploaded as a single
+        JSONL file and the batch is polled until it finishes. Requests that failed inside a
+        completed batch yield an empty result. New results are cached and persisted.
+        In test mode, falls back to generate_paper.
+
+        Args:
+            prompts (list): The generation prompts.
+            n (int): Number of papers sampled per prompt, as for generate_paper.
+
+        Returns:
+            list: One result per prompt, in the order of `prompts`: a paper, or a list of
+                n papers when n > 1.
+        """
+        if self.test_mode:
+            return [await self.generate_paper(prompt, n=n) for prompt in prompts]
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an AI research paper generator."},
-                {"role": "user", "content": prompt},
-            ],
+        empty = "" if n == 1 else []
+        papers = [self._cache_get(self._cache_key(prompt, n), empty) for prompt in prompts]
+        pending = [i for i, paper in enumerate(papers) if not paper]
+        if not pending:
+            return papers
+
+        lines = [
+            json.dumps({
+                "custom_id": f"req-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": self.model, "messages": self._messages(prompts[i]), "n": n},
+            })
+            for i in pending
+        ]
+        input_file = await self.client.files.create(
+            file=("evoscholar_batch.jsonl", "\n".join(lines).encode()),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
         )
-        paper = response.choices[0].message.content
-        return self.extract_text(paper)
+        while batch.status not in BATCH_FINAL_STATUSES:
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+            batch = await self.client.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'.")
+
+        if batch.output_file_id:
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") != 200:
+                    continue
+                index = int(result["custom_id"].removeprefix("req-"))
+                choices = [
+                    self.extract_text(choice["message"]["content"])
+                    for choice in response["body"]["choices"]
+                ]
+                papers[index] = choices[0] if n == 1 else choices
+        for i in pending:
+            if papers[i]:
+                self._cache_put(self._cache_key(prompts[i], n), papers[i])
+        self._save_cache()
+        return papers
 
     def evaluate_paper(self, paper_text, max_words=500):
         """
@@ -91,27 +490,26 @@ class SelfImprovingResearchAgent:
         if word_count > max_words:
             feedback += f"Paper is too long by {word_count - max_words} words. "
         # Check for essential sections
-        required_sections = [
-            "Title:",
-            "Abstract:",
-            "Introduction:",
-            "Proposed Method:",
-            "Conclusion:",
-        ]
-        missing_sections = [sec for sec in required_sections if sec not in paper_text]
+        missing_sections = [sec for sec in REQUIRED_SECTIONS if sec not in paper_text]
         if missing_sections:
             feedback += f"Missing sections: {', '.join(missing_sections)}. "
         if not feedback:
             feedback = f"Success! Paper length is {word_count} words."
         return feedback.strip()
 
-    def refine_paper(self, paper_text, feedback):
+    async def refine_paper(self, paper_text, feedback, versions=1, allow_cutoff=False):
         """
         Refines the research paper based on the provided feedback.
+        With versions > 1, the model is asked for several successive refinements
+        in one response and the last one is returned. If the response is cut off
+        for length, the last complete version is returned, or the input paper if
+        no version was completed.
 
         Args:
             paper_text (str): The current version of the paper.
             feedback (str): Feedback from evaluation.
+            versions (int): Number of successive refinements to request.
+            allow_cutoff (bool): Stop streaming a response that is far over the word limit.
 
         Returns:
             str: The refined research paper.
@@ -121,11 +519,36 @@ class SelfImprovingResearchAgent:
             f"Paper:\n{paper_text}\n\n"
             "Ensure the paper is concise (under 500 words), introduces a novel interdisciplinary concept "
             "by blending ideas from different STEM fields, and includes the sections: Title, Abstract, "
-            "Introduction, Proposed Method, and Conclusion."
+            "Introduction, Proposed Method, and Conclusion.\n\n"
+            f"Write {versions} successively refined version(s) of the paper, each one improving on the "
+            "previous one against the same requirements. Start each version with a line of the form "
+            "===PAPER k=== where k is the version number."
         )
-        return self.generate_paper(prompt)
+        # Every requested version counts towards the length of the response.
+        refined = await self.generate_paper(
+            prompt, max_words=500 * versions, allow_cutoff=allow_cutoff
+        )
+        return refined or paper_text
+
+    def select_best_paper(self, papers):
+        """
+        Picks the most promising paper from a list of candidates.
+        Papers that already pass evaluation are preferred; otherwise the one
+        with the shortest feedback (i.e. the fewest problems) wins.
 
-    def fetch_latest_papers(self, max_results=5, query="interdisciplinary research AI biology physics"):
+        Args:
+            papers (list): Candidate paper texts.
+
+        Returns:
+            str: The selected paper.
+        """
+        def score(paper):
+            feedback = self.evaluate_paper(paper)
+            return (not feedback.startswith("Success!"), len(feedback))
+
+        return min(papers, key=score)
+
+    async def fetch_latest_papers(self, max_results=5, query="interdisciplinary research AI biology physics"):
         """
         Fetches the latest arXiv papers based on the given query.
 
@@ -136,31 +559,46 @@ class SelfImprovingResearchAgent:
         Returns:
             list: A list of dictionaries with keys: title, abstract, link.
         """
-        search = arxiv.Search(
-            query=query,
-            max_results=max_results,
-            sort_by=arxiv.SortCriterion.SubmittedDate,
-        )
-        # Using the arxiv.Client() to get search results
-        client = arxiv.Client()
-        papers = []
-        for result in client.results(search):
-            papers.append({
-                "title": result.title,
-                "abstract": result.summary.replace("\n", " "),
-                "link": result.entry_id,
-            })
-        return papers
+        params = {
+            "search_query": query,
+            "max_results": max_results,
+            "sortBy": "submittedDate",
+            "sortOrder": "descending",
+        }
+        # Query the arXiv Atom API directly so the request doesn't block the event loop.
+        timeout = aiohttp.ClientTimeout(total=ARXIV_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(ARXIV_API_URL, params=params) as response:
+                response.raise_for_status()
+                content = await response.read()
+        return parse_arxiv_feed(content)
 
-    def run(self):
+    async def _warm_up_client(self):
+        """
+        Opens a connection to the API ahead of the first generation request,
+        so the TLS handshake is not paid on the critical path.
+        """
+        if self.test_mode:
+            return
+        try:
+            await self.client.models.list()
+        except Exception:
+            # Warm-up is best effort; the real request will surface any error.
+            pass
+
+    async def run(self):
         """
         Runs the self-improving research agent:
          - Fetches recent paper summaries.
-         - Generates an initial research paper.
-         - Iteratively refines the paper based on evaluation feedback.
+         - Samples several candidate papers and keeps the best one.
+         - Iteratively refines the paper based on evaluation feedback, stopping early
+           once it passes or refinement stops making progress.
          - Saves the final version to 'generated_paper.txt'.
         """
-        latest_papers = self.fetch_latest_papers()
+        # Overlap the arXiv request with setting up the API connection.
+        fetch_task = asyncio.create_task(self.fetch_latest_papers())
+        await self._warm_up_client()
+        latest_papers = await fetch_task
         paper_summaries = "\n".join(
             [
                 f"Title: {paper['title']}\nAbstract: {paper['abstract']}"
@@ -175,30 +613,173 @@ class SelfImprovingResearchAgent:
             "Introduction, Proposed Method, and Conclusion. Propose a novel concept by blending ideas from different STEM fields."
         )
 
-        paper_text = self.generate_paper(base_prompt)
+        # Both paths sample all candidates from a single request with n=num_candidates.
+        if self.batch_mode:
+            [candidates] = await self.run_batch([base_prompt], n=self.num_candidates)
+            if not candidates:
+                raise RuntimeError("The batch request for candidate papers failed.")
+        else:
+            candidates = await self.generate_paper(base_prompt, n=self.num_candidates)
+        if self.num_candidates == 1:
+            candidates = [candidates]
+        paper_text = self.select_best_paper(candidates)
         file_name = "generated_paper.txt"
 
-        for i in range(self.iterations):
-            # Save current version
-            with open(file_name, "w") as f:
-                f.write(paper_text)
-
+        # Several refinement iterations are batched into each API call.
+        previous_feedback = None
+        unchanged = 0
+        for start in range(0, self.iterations, self.refinements_per_call):
+            versions = min(self.refinements_per_call, self.iterations - start)
             feedback = self.evaluate_paper(paper_text)
-            print(f"Iteration {i+1} feedback: {feedback}")
-            paper_text = self.refine_paper(paper_text, feedback)
+            print(f"Iteration {start+1} feedback: {feedback}")
+            if feedback.startswith("Success!"):
+                # Already valid; a refinement call would be wasted.
+                break
+            unchanged = unchanged + 1 if feedback == previous_feedback else 0
+            if unchanged >= self.max_no_improvement:
+                print("Refinement is no longer changing the feedback; stopping.")
+                break
+            previous_feedback = feedback
+            # The final refinement is what gets saved, so it is never cut off.
+            final = start + versions >= self.iterations
+            paper_text = await self.refine_paper(
+                paper_text, feedback, versions, allow_cutoff=not final
+            )
 
         print("\nFinal Version of the Paper:")
         print(paper_text)
-        with open(file_name, "w") as f:
-            f.write(paper_text)
+        # Only the final version is persisted; intermediate drafts are not used.
+        async with aiofiles.open(file_name, "w") as f:
+            await f.write(paper_text)
+        self._save_cache()
 
 
 # --------------------- Testing --------------------- #
+_ARXIV_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>ArXiv Query</title>
+  <entry>
+    <id>http://arxiv.org/abs/2501.00001v1</id>
+    <title>Quantum Frustration Meets
+  Omni-Modal Learning</title>
+    <summary>  We study geometrical
+  frustration in molecular clouds
+  and its links to learning.
+</summary>
+  </entry>
+  <entry>
+    <id>http://arxiv.org/abs/2501.00002v2</id>
+    <title>Microswimmer Dynamics</title>
+    <summary>Short abstract.</summary>
+  </entry>
+</feed>
+"""
+
+
+class _FakeArxivSession:
+    """Stands in for aiohttp.ClientSession in fetch_latest_papers."""
+
+    instances = []
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.requests = []
+        _FakeArxivSession.instances.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @contextlib.asynccontextmanager
+    async def get(self, url, params=None):
+        self.requests.append((url, params))
+        yield types.SimpleNamespace(raise_for_status=lambda: None, read=self._read)
+
+    async def _read(self):
+        return _ARXIV_FEED
+
+
+class _FakeBatchClient:
+    """Stands in for the files/batches endpoints used by run_batch."""
+
+    def __init__(self, output_lines, status="completed"):
+        self.output_lines = output_lines
+        self.status = status
+        self.uploads = []
+        self.files = types.SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = types.SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    async def _create_file(self, file, purpose):
+        self.uploads.append([json.loads(line) for line in file[1].decode().splitlines()])
+        return types.SimpleNamespace(id=f"file-in-{len(self.uploads)}")
+
+    async def _create_batch(self, input_file_id, endpoint, completion_window):
+        return types.SimpleNamespace(id="batch-1", status=self.status, output_file_id="file-out")
+
+    async def _retrieve_batch(self, batch_id):
+        return types.SimpleNamespace(id=batch_id, status=self.status, output_file_id="file-out")
+
+    async def _file_content(self, file_id):
+        return types.SimpleNamespace(text="\n".join(json.dumps(line) for line in self.output_lines))
+
+
+def _batch_line(custom_id, content, status_code=200):
+    body = {"choices": [{"message": {"content": content}}]} if status_code == 200 else {}
+    return {"custom_id": custom_id, "response": {"status_code": status_code, "body": body}}
+
+
+def _stream_chunk(index, content):
+    return types.SimpleNamespace(
+        choices=[types.SimpleNamespace(index=index, delta=types.SimpleNamespace(content=content))]
+    )
+
+
+class _FakeStream:
+    """Async iterable standing in for a streamed chat completion."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            self.consumed += 1
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeCompletions:
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.calls = []
+        self.stream = None
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.stream = _FakeStream(self._chunks)
+        return self.stream
+
+
 class TestSelfImprovingResearchAgent(unittest.TestCase):
     def setUp(self):
         # Use test_mode=True to avoid real API calls during tests.
         self.agent = SelfImprovingResearchAgent(test_mode=True)
 
+    def _use_fake_stream(self, chunks):
+        # Route generate_paper through a fake streaming client instead of the dummy paper.
+        completions = _FakeCompletions(chunks)
+        self.agent.test_mode = False
+        self.agent.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+        return completions
+
     def test_extract_text_with_code_block(self):
         input_text = "Some text\n```python\nTitle: Test Paper\nAbstract: Test Abstract\n```"
         expected_output = "Title: Test Paper\nAbstract: Test Abstract"
@@ -209,6 +790,28 @@ class TestSelfImprovingResearchAgent(unittest.TestCase):
         expected_output = "Title: Direct Text Paper\nAbstract: Direct Abstract"
         self.assertEqual(self.agent.extract_text(input_text), expected_output)
 
+    def test_extract_text_keeps_last_paper_version(self):
+        input_text = (
+            "===PAPER 1===\nTitle: First Draft\n"
+            "===PAPER 2===\n```\nTitle: Second Draft\n```\n"
+        )
+        self.assertEqual(self.agent.extract_text(input_text), "Title: Second Draft")
+
+    def test_extract_text_keeps_separator_lines_inside_version(self):
+        input_text = (
+            "===PAPER 1===\nTitle: First Draft\n"
+            "===PAPER 2===\nTitle: Second Draft\n===\nAbstract: Kept.\n"
+        )
+        self.assertEqual(self.agent.extract_text(input_text), "Title: Second Draft\n===\nAbstract: Kept.")
+
+    def test_extract_text_strips_fence_around_all_versions(self):
+        input_text = "```\n===PAPER 1===\nTitle: A\n===PAPER 2===\nTitle: B\n```"
+        self.assertEqual(self.agent.extract_text(input_text), "Title: B")
+
+    def test_extract_text_accepts_spaced_markers(self):
+        input_text = "=== PAPER 1 ===\nTitle: First Draft\n=== PAPER 2 ===\nTitle: Second Draft\n"
+        self.assertEqual(self.agent.extract_text(input_text), "Title: Second Draft")
+
     def test_evaluate_paper_success(self):
         paper_text = (
             "Title: Test Research Paper\n"
@@ -225,6 +828,10 @@ class TestSelfImprovingResearchAgent(unittest.TestCase):
         feedback = self.agent.evaluate_paper(paper_text, max_words=500)
         self.assertIn("Missing sections", feedback)
 
+    def test_evaluate_paper_accepts_markdown_headers(self):
+        paper_text = "".join(f"**{sec}** Text.\n" for sec in REQUIRED_SECTIONS)
+        self.assertIn("Success!", self.agent.evaluate_paper(paper_text, max_words=500))
+
     def test_refine_paper_returns_non_empty(self):
         original_paper = (
             "Title: Original Paper\n"
@@ -234,17 +841,392 @@ class TestSelfImprovingResearchAgent(unittest.TestCase):
             "Conclusion: Some conclusion."
         )
         feedback = "Paper is too long by 100 words. Missing sections: Results."
-        refined_paper = self.agent.refine_paper(original_paper, feedback)
+        refined_paper = asyncio.run(self.agent.refine_paper(original_paper, feedback))
         self.assertTrue(len(refined_paper) > 0)
         self.assertIn("Title:", refined_paper)
         self.assertIn("Abstract:", refined_paper)
 
+    def test_generate_paper_returns_cached_response(self):
+        self.agent._cache[self.agent._cache_key("cached prompt")] = "Title: Cached Paper"
+        self.assertEqual(asyncio.run(self.agent.generate_paper("cached prompt")), "Title: Cached Paper")
+
+    def test_generate_paper_does_not_cache_truncated_response(self):
+        chunks = [_stream_chunk(0, "Title: Long Paper\n")]
+        chunks += [_stream_chunk(0, "word " * 10) for _ in range(80)]
+        completions = self._use_fake_stream(chunks)
+
+        paper = asyncio.run(self.agent.generate_paper("long prompt", max_words=500, allow_cutoff=True))
+
+        self.assertTrue(completions.stream.closed)
+        self.assertLess(completions.stream.consumed, len(chunks))
+        # A single cut-off version is incomplete, so no paper is returned.
+        self.assertEqual(paper, "")
+        self.assertNotIn(self.agent._cache_key("long prompt"), self.agent._cache)
+        asyncio.run(self.agent.generate_paper("long prompt", max_words=500, allow_cutoff=True))
+        self.assertEqual(len(completions.calls), 2)
+
+    def test_generate_paper_reads_whole_stream_without_cutoff(self):
+        chunks = [_stream_chunk(0, "Title: Long Paper\n")]
+        chunks += [_stream_chunk(0, "word " * 10) for _ in range(80)]
+        completions = self._use_fake_stream(chunks)
+
+        paper = asyncio.run(self.agent.generate_paper("long prompt", max_words=500))
+
+        self.assertEqual(completions.stream.consumed, len(chunks))
+        self.assertEqual(len(paper.split()), 803)
+
+    def test_refine_paper_returns_last_complete_version_when_truncated(self):
+        chunks = []
+        for k in range(1, 4):
+            chunks.append(_stream_chunk(0, f"===PAPER {k}===\n"))
+            for sec in REQUIRED_SECTIONS:
+                chunks.append(_stream_chunk(0, f"{sec} Version {k}.\n"))
+                chunks += [_stream_chunk(0, "word " * 10 + "\n") for _ in range(13)]
+        self._use_fake_stream(chunks)
+
+        paper = asyncio.run(self.agent.refine_paper(
+            "Title: Draft", "Paper is too long.", versions=3, allow_cutoff=True
+        ))
+
+        self.assertTrue(paper.startswith("Title: Version 2."))
+        feedback = self.agent.evaluate_paper(paper)
+        self.assertIn("too long", feedback)
+        self.assertNotIn("Missing sections", feedback)
+
+    def test_refine_paper_falls_back_to_draft_when_single_version_truncated(self):
+        chunks = [_stream_chunk(0, "===PAPER 1===\n")]
+        for sec in REQUIRED_SECTIONS:
+            chunks.append(_stream_chunk(0, f"{sec} Refined.\n"))
+            chunks += [_stream_chunk(0, "word " * 10 + "\n") for _ in range(13)]
+        self._use_fake_stream(chunks)
+        draft = "Title: Draft\nAbstract: Too long."
+
+        paper = asyncio.run(self.agent.refine_paper(draft, "Paper is too long.", allow_cutoff=True))
+        self.assertEqual(paper, draft)
+
+        paper = asyncio.run(self.agent.refine_paper(draft, "Paper is too long.", allow_cutoff=False))
+        self.assertIn("Conclusion: Refined.", paper)
+
+    def test_generate_paper_caches_complete_response(self):
+        completions = self._use_fake_stream([_stream_chunk(0, "Title: Short "), _stream_chunk(0, "Paper")])
+        self.assertEqual(asyncio.run(self.agent.generate_paper("short prompt")), "Title: Short Paper")
+        self.assertEqual(asyncio.run(self.agent.generate_paper("short prompt")), "Title: Short Paper")
+        self.assertEqual(len(completions.calls), 1)
+
+    def _run_with_refinements(self, refined_papers, **kwargs):
+        # Runs the agent on stubbed inputs and returns how many refinement calls were made.
+        agent = SelfImprovingResearchAgent(test_mode=True, **kwargs)
+        refinements = iter(refined_papers)
+        calls = []
+
+        async def fetch_latest_papers():
+            return []
+
+        async def generate_paper(prompt, n=1):
+            return ["Title: Incomplete Paper"] * n
+
+        async def refine_paper(paper_text, feedback, versions=1, allow_cutoff=False):
+            calls.append(allow_cutoff)
+            return next(refinements)
+
+        agent.fetch_latest_papers = fetch_latest_papers
+        agent.generate_paper = generate_paper
+        agent.refine_paper = refine_paper
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as output_dir:
+            os.chdir(output_dir)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    asyncio.run(agent.run())
+            finally:
+                os.chdir(cwd)
+        return calls
+
+    def test_run_stops_refining_once_paper_passes(self):
+        passing = asyncio.run(self.agent.generate_paper("prompt"))
+        calls = self._run_with_refinements(
+            ["Title: Still Incomplete\nAbstract: Better.", passing, passing],
+            iterations=5,
+            refinements_per_call=1,
+        )
+        self.assertEqual(len(calls), 2)
+
+    def test_run_stops_refining_when_feedback_stalls(self):
+        calls = self._run_with_refinements(
+            ["Title: Incomplete Paper"] * 5,
+            iterations=5,
+            refinements_per_call=1,
+            max_no_improvement=2,
+        )
+        self.assertEqual(len(calls), 2)
+
+    def test_run_never_cuts_off_final_refinement(self):
+        calls = self._run_with_refinements(
+            ["Title: A", "Title: A\nAbstract: B", "Title: A\nAbstract: B\nIntroduction: C"],
+            iterations=3,
+            refinements_per_call=1,
+        )
+        self.assertEqual(calls, [True, True, False])
+        self.assertEqual(self._run_with_refinements(["Title: A"]), [False])
+
+    def test_cache_evicts_least_recently_used_entries(self):
+        self.agent.max_cache_entries = 2
+        self.agent._cache_put("a", "Paper A")
+        self.agent._cache_put("b", "Paper B")
+        self.agent._cache_get("a")
+        self.agent._cache_put("c", "Paper C")
+        self.assertEqual(list(self.agent._cache), ["a", "c"])
+
+    def test_load_cache_keeps_most_recent_entries(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.agent.cache_path = os.path.join(cache_dir, "cache.json")
+            with open(self.agent.cache_path, "w") as f:
+                json.dump({"a": "Paper A", "b": "Paper B", "c": "Paper C"}, f)
+            self.agent.max_cache_entries = 2
+            self.assertEqual(self.agent._load_cache(), {"b": "Paper B", "c": "Paper C"})
+
+    def test_parse_arxiv_feed_normalizes_wrapped_text(self):
+        papers = parse_arxiv_feed(_ARXIV_FEED)
+        self.assertEqual(papers, [
+            {
+                "title": "Quantum Frustration Meets Omni-Modal Learning",
+                "abstract": "We study geometrical frustration in molecular clouds and its links to learning.",
+                "link": "http://arxiv.org/abs/2501.00001v1",
+            },
+            {
+                "title": "Microswimmer Dynamics",
+                "abstract": "Short abstract.",
+                "link": "http://arxiv.org/abs/2501.00002v2",
+            },
+        ])
+
+    def test_fetch_latest_papers_queries_arxiv_with_timeout(self):
+        _FakeArxivSession.instances.clear()
+        with mock.patch.object(aiohttp, "ClientSession", _FakeArxivSession):
+            papers = asyncio.run(self.agent.fetch_latest_papers(max_results=2, query="physics"))
+
+        [session] = _FakeArxivSession.instances
+        self.assertEqual(session.timeout.total, ARXIV_TIMEOUT_SECONDS)
+        url, params = session.requests[0]
+        self.assertEqual(url, ARXIV_API_URL)
+        self.assertEqual(params["search_query"], "physics")
+        self.assertEqual(params["max_results"], 2)
+        self.assertEqual(params["sortBy"], "submittedDate")
+        self.assertEqual(len(papers), 2)
+
+    def test_count_new_words_across_fragments(self):
+        total, in_word = 0, False
+        for delta in ["Title: Str", "eamed pa", "per\n", "Abstract: ", "", "Short."]:
+            new_words, in_word = count_new_words(delta, in_word)
+            total += new_words
+        self.assertEqual(total, len("Title: Streamed paper\nAbstract: Short.".split()))
+
+    def test_run_batch_returns_one_paper_per_prompt(self):
+        papers = asyncio.run(self.agent.run_batch(["first prompt", "second prompt"]))
+        self.assertEqual(len(papers), 2)
+        self.assertTrue(all("Title:" in paper for paper in papers))
+
+    def test_run_batch_maps_results_and_uses_cache(self):
+        client = _FakeBatchClient([
+            _batch_line("req-2", "Title: Third"),
+            _batch_line("req-1", "", status_code=500),
+            _batch_line("req-0", "Title: First"),
+        ])
+        self.agent.test_mode = False
+        self.agent.client = client
+        prompts = ["first prompt", "second prompt", "third prompt"]
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.agent.cache_path = os.path.join(cache_dir, "cache.json")
+            papers = asyncio.run(self.agent.run_batch(prompts))
+            with open(self.agent.cache_path) as f:
+                self.assertEqual(len(json.load(f)), 2)
+        self.agent.cache_path = None
+
+        self.assertEqual(papers, ["Title: First", "", "Title: Third"])
+        upload = client.uploads[0]
+        self.assertEqual([line["custom_id"] for line in upload], ["req-0", "req-1", "req-2"])
+        self.assertEqual(upload[1]["url"], "/v1/chat/completions")
+        self.assertEqual(upload[1]["body"]["messages"][-1]["content"], "second prompt")
+
+        # Only the failed prompt is submitted again.
+        client.output_lines = [_batch_line("req-1", "Title: Second")]
+        papers = asyncio.run(self.agent.run_batch(prompts))
+        self.assertEqual(papers, ["Title: First", "Title: Second", "Title: Third"])
+        self.assertEqual([line["custom_id"] for line in client.uploads[1]], ["req-1"])
+
+        asyncio.run(self.agent.run_batch(prompts))
+        self.assertEqual(len(client.uploads), 2)
+
+    def test_run_batch_raises_when_batch_fails(self):
+        self.agent.test_mode = False
+        self.agent.client = _FakeBatchClient([], status="failed")
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.agent.run_batch(["prompt"]))
+
+    def test_run_batch_samples_n_papers_per_prompt(self):
+        client = _FakeBatchClient([{
+            "custom_id": "req-0",
+            "response": {"status_code": 200, "body": {"choices": [
+                {"message": {"content": "Title: First"}},
+                {"message": {"content": "Title: Second"}},
+            ]}},
+        }])
+        self.agent.test_mode = False
+        self.agent.client = client
+
+        [papers] = asyncio.run(self.agent.run_batch(["prompt"], n=2))
+
+        self.assertEqual(papers, ["Title: First", "Title: Second"])
+        self.assertEqual(len(client.uploads[0]), 1)
+        self.assertEqual(client.uploads[0][0]["body"]["n"], 2)
+
+    def test_generate_paper_splits_interleaved_choices(self):
+        chunks = [
+            _stream_chunk(0, "Title: Long "),
+            _stream_chunk(1, "Title: Short "),
+            _stream_chunk(0, "word " * 7),
+            _stream_chunk(1, "Paper"),
+            _stream_chunk(0, "still kept"),
+            _stream_chunk(1, " continues."),
+        ]
+        completions = self._use_fake_stream(chunks)
+
+        papers = asyncio.run(self.agent.generate_paper("prompt", max_words=5, n=2, allow_cutoff=True))
+
+        self.assertEqual(papers, ["Title: Long " + "word " * 7 + "still kept", "Title: Short Paper continues."])
+        self.assertEqual(completions.calls[0]["n"], 2)
+        # Only one choice passed the limit, so the stream was read to the end.
+        self.assertEqual(completions.stream.consumed, len(chunks))
+
+    def test_generate_paper_stops_once_every_choice_is_too_long(self):
+        chunks = [
+            _stream_chunk(0, "word " * 7),
+            _stream_chunk(1, "word " * 7),
+            _stream_chunk(0, "never read"),
+        ]
+        completions = self._use_fake_stream(chunks)
+
+        papers = asyncio.run(self.agent.generate_paper("prompt", max_words=5, n=2, allow_cutoff=True))
+
+        self.assertEqual(papers, ["", ""])
+        self.assertEqual(completions.stream.consumed, 2)
+        self.assertTrue(completions.stream.closed)
+
+    def test_generate_paper_returns_n_candidates(self):
+        papers = asyncio.run(self.agent.generate_paper("prompt", n=3))
+        self.assertEqual(len(papers), 3)
+        self.assertTrue(all("Title:" in paper for paper in papers))
+
+    def test_select_best_paper_prefers_passing_paper(self):
+        incomplete = "Title: Incomplete Paper\nAbstract: Missing sections."
+        complete = asyncio.run(self.agent.generate_paper("prompt"))
+        self.assertEqual(self.agent.select_best_paper([incomplete, complete]), complete)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def _run_with_fake_clock(self, scenario):
+        # Runs scenario(clock) with time frozen except for the limiter's sleeps,
+        # which advance the clock instantly. Returns the requested sleep durations.
+        clock = [0.0]
+        sleeps = []
+        real_sleep = asyncio.sleep
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            clock[0] += delay
+            await real_sleep(0)
+
+        fake_time = types.SimpleNamespace(monotonic=lambda: clock[0])
+        with mock.patch(f"{__name__}.time", fake_time), mock.patch("asyncio.sleep", fake_sleep):
+            asyncio.run(scenario())
+        return sleeps
+
+    def test_acquire_waits_for_request_quota(self):
+        async def scenario():
+            limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=10_000)
+            for _ in range(3):
+                async with limiter.acquire(estimated_tokens=1):
+                    pass
+
+        self.assertEqual(self._run_with_fake_clock(scenario), [30.0])
+
+    def test_acquire_waits_for_token_quota(self):
+        async def scenario():
+            limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=600)
+            async with limiter.acquire(estimated_tokens=600):
+                pass
+            async with limiter.acquire(estimated_tokens=300):
+                pass
+
+        self.assertEqual(self._run_with_fake_clock(scenario), [30.0])
+
+    def test_waiters_are_served_in_arrival_order(self):
+        order = []
+
+        async def scenario():
+            limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=10_000)
+
+            async def request(name):
+                async with limiter.acquire():
+                    order.append(name)
+
+            await asyncio.gather(request("a"), request("b"), request("c"))
+
+        self.assertEqual(self._run_with_fake_clock(scenario), [60.0, 60.0])
+        self.assertEqual(order, ["a", "b", "c"])
+
+    def test_max_concurrency_caps_in_flight_requests(self):
+        in_flight = [0]
+        peak = [0]
+
+        async def scenario():
+            limiter = RateLimiter(max_concurrency=2)
+
+            async def request():
+                async with limiter.acquire():
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                    for _ in range(3):
+                        await asyncio.sleep(0)
+                    in_flight[0] -= 1
+
+            await asyncio.gather(*[request() for _ in range(5)])
+
+        asyncio.run(scenario())
+        self.assertEqual(peak[0], 2)
+
+    def test_rejects_non_positive_limits(self):
+        for kwargs in ({"requests_per_minute": 0}, {"tokens_per_minute": 0}, {"max_concurrency": 0}):
+            with self.assertRaises(ValueError):
+                RateLimiter(**kwargs)
+
+    def test_acquire_consumes_quota(self):
+        limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+
+        async def acquire():
+            async with limiter.acquire(estimated_tokens=100):
+                pass
+
+        asyncio.run(acquire())
+        self.assertLess(limiter._available_requests, 10)
+        self.assertLess(limiter._available_tokens, 1000)
+
+    def test_refill_is_capped_at_quota(self):
+        limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+        limiter._last_refill -= 3600
+        limiter._refill()
+        self.assertEqual(limiter._available_requests, 10)
+        self.assertEqual(limiter._available_tokens, 1000)
+
 
 if __name__ == "__main__":
     if "--test" in sys.argv:
         # Run unit tests if "--test" flag is provided
         unittest.main(argv=[sys.argv[0]])
     else:
-        agent = SelfImprovingResearchAgent()
-        agent.run()
-
+        # "--cache" persists generated papers between runs, see DEFAULT_CACHE_PATH.
+        agent = SelfImprovingResearchAgent(
+            cache_path=DEFAULT_CACHE_PATH if "--cache" in sys.argv else None
+        )
+        asyncio.run(agent.run())